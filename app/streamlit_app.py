@@ -17,6 +17,7 @@ sys.path.append(str(ROOT_DIR))
 # Now import modules
 from main import RoadSafetyScorer
 from utils.video_utils import read_video, get_video_properties
+from utils.config import DETECT_STRIDE
 
 # Page configuration
 st.set_page_config(
@@ -134,6 +135,15 @@ def render_sidebar():
             help="Duration of each analysis segment"
         )
 
+        detect_stride = st.slider(
+            "Detection Stride (frames)",
+            min_value=1,
+            max_value=10,
+            value=DETECT_STRIDE,
+            step=1,
+            help="Run the detector every Nth frame and track objects in between"
+        )
+
         device_options = ["CPU", "GPU"] if torch.cuda.is_available() else ["CPU"]
         selected_device = st.selectbox(
             "Processing Device",
@@ -155,10 +165,10 @@ def render_sidebar():
             </div>
         """, unsafe_allow_html=True)
 
-        return uploaded_file, segment_size, processing_device
+        return uploaded_file, segment_size, detect_stride, processing_device
 
 # Main analysis function
-def analyze_video(uploaded_file, segment_size, processing_device):
+def analyze_video(uploaded_file, segment_size, detect_stride, processing_device):
     with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp_input:
         tmp_input.write(uploaded_file.read())
         input_path = tmp_input.name
@@ -182,7 +192,8 @@ def analyze_video(uploaded_file, segment_size, processing_device):
 
             scorer = RoadSafetyScorer(
                 device=processing_device,
-                segment_size=segment_size
+                segment_size=segment_size,
+                detect_stride=detect_stride
             )
             start_time = time.time()
             result = scorer.process_video(input_path, output_path)
@@ -232,7 +243,7 @@ def render_results(result, uploaded_file):  # Add uploaded_file as parameter
             <div class="metric-card">
                 <div style="font-size: 1rem; color: #7f8c8d;">Video Duration</div>
                 <div style="font-size: 1.5rem; font-weight: bold; text-align: center;">
-                    {(result.get('frame_stats', [{}])[-1].get('timestamp', 0)):.1f}s
+                    {float(result.get('frame_stats', {}).get('timestamp', [0])[-1]):.1f}s
                 </div>
             </div>
         """, unsafe_allow_html=True)
@@ -284,14 +295,14 @@ def render_results(result, uploaded_file):  # Add uploaded_file as parameter
 # In your main function, update the call to render_results:
 def main():
     render_header()
-    uploaded_file, segment_size, processing_device = render_sidebar()
+    uploaded_file, segment_size, detect_stride, processing_device = render_sidebar()
     
     if uploaded_file is not None:
         st.markdown("### 🎥 Video Preview")
         st.video(uploaded_file)
         
         if st.button("🚀 Analyze Video", use_container_width=True):
-            result = analyze_video(uploaded_file, segment_size, processing_device)
+            result = analyze_video(uploaded_file, segment_size, detect_stride, processing_device)
             
             if result and not result.get('error'):
                 st.success("✅ Analysis completed successfully!")
@@ -1,41 +1,76 @@
 import cv2
 import numpy as np
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 import tensorflow as tf
 import logging
 
 logger = logging.getLogger(__name__)
 
+# The classifier shares the GPU with the YOLOX detector, so allocate memory on demand
+# instead of letting TensorFlow reserve the whole device up front
+for _gpu in tf.config.list_physical_devices("GPU"):
+    try:
+        tf.config.experimental.set_memory_growth(_gpu, True)
+    except RuntimeError:  # Device already initialised elsewhere
+        pass
+
 class PotholeDetector:
-    def __init__(self, model_path: str="pothole.h5", input_size: int = 300, threshold: float = 0.9):
+    def __init__(self, model_path: str="pothole.h5", input_size: int = 300, threshold: float = 0.9,
+                 batch_size: int = 8):
         self.input_size = input_size
         self.threshold = threshold
         
+        # Reused input tensor; grown if a larger batch is ever passed in
+        self._batch = np.empty((batch_size, input_size, input_size, 1), dtype=np.float32)
+        # uint8 staging buffers for the resize and grayscale conversion of each frame
+        self._resized = np.empty((input_size, input_size, 3), dtype=np.uint8)
+        self._gray = np.empty((input_size, input_size), dtype=np.uint8)
+        
         try:
             self.model = tf.keras.models.load_model(model_path, compile=False)
             self.model.compile()  # Recompile with default settings
-            logger.info("Pothole model loaded successfully")
+            
+            # Traced, XLA-compiled forward pass; batch dimension stays dynamic
+            self._infer = tf.function(
+                lambda x: self.model(x, training=False),
+                input_signature=[tf.TensorSpec([None, input_size, input_size, 1], tf.float32)],
+                jit_compile=True
+            )
+            # XLA compiles once per input shape, so warm up every batch size up to batch_size
+            # (sampled counts vary by batch and the last batch of a video is shorter)
+            for n in range(1, batch_size + 1):
+                self._infer(tf.zeros((n,) + self._batch.shape[1:]))
+            logger.info("Pothole model loaded successfully (%s)",
+                        "GPU" if tf.config.list_physical_devices("GPU") else "CPU")
         except Exception as e:
             logger.error(f"Failed to load pothole model: {str(e)}")
             raise
 
     def predict(self, frame: np.ndarray) -> Tuple[Optional[int], float]:
         """Predict pothole presence in frame"""
-        try:
-            if len(frame.shape) == 3:  # Convert to grayscale if color
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            
-            frame = cv2.resize(frame, (self.input_size, self.input_size))
-            frame = frame.reshape(1, self.input_size, self.input_size, 1)
-            frame = frame.astype('float32') / 255.0
-            
-            predictions = self.model.predict(frame, verbose=0)
-            max_prob = np.max(predictions)
-            
-            if max_prob >= self.threshold:
-                return np.argmax(predictions), max_prob
-            return None, max_prob
+        labels, probs = self.predict_batch([frame])
+        label = int(labels[0])
+        return (label if label >= 0 else None), float(probs[0])
+
+    def predict_batch(self, frames: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Predict pothole presence for a batch of frames (label is -1 below threshold)"""
+        if len(frames) > len(self._batch):
+            self._batch = np.empty((len(frames),) + self._batch.shape[1:], dtype=np.float32)
+        batch = self._batch[:len(frames)]
+        is_color = frames[0].ndim == 3  # Frames of one video share a layout
+        size = (self.input_size, self.input_size)
+        resized = self._resized if is_color else self._gray
+        
+        for i, frame in enumerate(frames):
+            # Downsample first so the colour conversion only touches input_size^2 pixels
+            cv2.resize(frame, size, dst=resized)
+            if is_color:  # Convert to grayscale if color
+                cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY, dst=self._gray)
             
-        except Exception as e:
-            logger.error(f"Pothole prediction failed: {str(e)}")
-            return None, 0.0
\ No newline at end of file
+            # Normalise straight into the model input buffer
+            np.multiply(self._gray, 1.0 / 255.0, out=batch[i, :, :, 0])
+        
+        predictions = self._infer(tf.convert_to_tensor(batch)).numpy()
+        max_probs = predictions.max(axis=1)
+        labels = np.where(max_probs >= self.threshold, predictions.argmax(axis=1), -1)
+        return labels, max_probs
@@ -6,7 +6,10 @@ from utils.config import ROAD_DETECTION
 
 class RoadDetector:
     def __init__(self):
-        self.road_width_history = []
+        # Ring buffer of the last 10 (left, right) edge pairs
+        self.road_width_history = np.zeros((10, 2), dtype=np.int32)
+        self._history_len = 0
+        self._history_idx = 0
         self.stable_road_width = None
     
     def detect_road_edges(self, frame: np.ndarray) -> Optional[Tuple[int, int]]:
@@ -27,33 +30,26 @@ class RoadDetector:
                                maxLineGap=ROAD_DETECTION['MAX_LINE_GAP'])
         
         if lines is not None:
-            leftmost, rightmost = frame.shape[1], 0
-            for line in lines:
-                x1, y1, x2, y2 = line[0]
-                if abs(y2 - y1) > 20:  # Filter near-horizontal lines
-                    x = min(x1, x2)
-                    if x < leftmost:
-                        leftmost = x
-                    x = max(x1, x2)
-                    if x > rightmost:
-                        rightmost = x
-            
-            if rightmost - leftmost > frame.shape[1]//2:  # Sanity check
-                self.road_width_history.append((leftmost, rightmost))
-                if len(self.road_width_history) > 10:
-                    self.road_width_history.pop(0)
-                return leftmost, rightmost
+            segments = lines[:, 0, :]
+            segments = segments[np.abs(segments[:, 3] - segments[:, 1]) > 20]  # Filter near-horizontal lines
+            if len(segments):
+                xs = segments[:, [0, 2]]
+                leftmost, rightmost = int(xs.min()), int(xs.max())
+                
+                if rightmost - leftmost > frame.shape[1]//2:  # Sanity check
+                    self.road_width_history[self._history_idx] = (leftmost, rightmost)
+                    self._history_idx = (self._history_idx + 1) % len(self.road_width_history)
+                    self._history_len = min(self._history_len + 1, len(self.road_width_history))
+                    return leftmost, rightmost
         
         return None
     
     def get_stable_road_width(self, frame_width: int) -> Tuple[int, int]:
         """Get smoothed road width from history"""
-        if not self.road_width_history:
+        if not self._history_len:
             return 50, frame_width - 50  # Default margins
         
-        lefts, rights = zip(*self.road_width_history)
-        avg_left = int(sum(lefts)/len(lefts))
-        avg_right = int(sum(rights)/len(rights))
+        avg_left, avg_right = (int(v) for v in self.road_width_history[:self._history_len].mean(axis=0))
         
         # Apply some constraints
         margin = frame_width // 10
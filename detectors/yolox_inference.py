@@ -2,22 +2,65 @@ import torch
 import cv2
 import numpy as np
 import logging
+import threading
+from collections import deque
 logger = logging.getLogger(__name__)
 from yolox.utils import postprocess
 from yolox.data.data_augment import preproc
 from yolox.exp import get_exp
 from yolox.utils import get_model_info
 from yolox.data.datasets import COCO_CLASSES
+from pathlib import Path
 from typing import List, Tuple, Optional
-from utils.config import CLASS_IDS, DETECTION_THRESHOLD
+from utils.config import (CLASS_IDS, CATEGORIES, DETECTION_THRESHOLD, DETECTOR_INPUT_SIZE, COMPILE_DETECTOR,
+                          DETECTOR_FP16, OPENVINO_IR_SUFFIX)
+
+try:
+    import openvino as ov
+except ImportError:
+    ov = None
+
+# Input shape is fixed, so let cuDNN benchmark and keep the fastest kernels
+torch.backends.cudnn.benchmark = True
+
+class _OVBatch:
+    """Outputs of one enqueued chunk, filled in by OpenVINO callbacks as its requests finish"""
+    def __init__(self, n: int):
+        self.outputs = [None] * n
+        self.remaining = n
+        self.lock = threading.Lock()
+        self.done = threading.Event()  # Set once every image of the chunk has an output
 
 class YOLOXDetector:
-    def __init__(self, model_path: str = "yolox_s.pth", device: str = "cuda"):
+    def __init__(self, model_path: str = "yolox_s.pth", device: str = "cuda", batch_size: int = 1):
         self.device = device
+        self.input_size = DETECTOR_INPUT_SIZE
+        # Every forward runs exactly batch_size rows (short batches are padded) so the shape never changes
+        self.batch_size = max(1, int(batch_size))
+        self.fp16 = False
         self.model = self._load_model(model_path)
+        self.ov_model = self._load_openvino(model_path) if self.device == "cpu" else None
+        self._ov_queue = None
+        if self.ov_model is not None:
+            # Pool of infer requests so enqueue_batch() keeps every CPU stream busy
+            jobs = self.ov_model.get_property("OPTIMAL_NUMBER_OF_INFER_REQUESTS")
+            self._ov_queue = ov.AsyncInferQueue(self.ov_model, jobs)
+            self._ov_queue.set_callback(self._on_ov_done)
+        self._pending = deque()  # Batches in flight: (raw outputs, ratios, completion event)
+        self._ready = deque()  # Postprocessed detections not yet returned by poll()
+        # Staging buffer reused by detect_batch() for every call
+        self._input_buf = self._alloc_input(self.batch_size)
+        if self.device == "cuda":
+            self._setup_pipeline()
         self.class_names = COCO_CLASSES
         self.cls_id_to_name = {i: name for i, name in enumerate(self.class_names)}
         
+        # Lookup table from COCO class id to index into self.categories (-1 = ignored class)
+        self.categories = CATEGORIES
+        self.cls_to_cat = np.full(len(self.class_names), -1, dtype=np.int8)
+        for cat_idx, ids in enumerate(CLASS_IDS.values()):
+            self.cls_to_cat[ids] = cat_idx
+        
 # yolox_inference.py
     def _load_model(self, model_path: str):
         """Load YOLOX model"""
@@ -39,55 +82,244 @@ class YOLOXDetector:
         model.load_state_dict(ckpt["model"])
         logger.info("Loaded checkpoint successfully.")
     
+        if DETECTOR_FP16 and self.device == "cuda":
+            model.half()
+            self.fp16 = True
+    
+        # Input shape never changes, so specialise the graph once for it
+        if COMPILE_DETECTOR and self.device == "cuda" and hasattr(torch, "compile"):
+            logger.info("Compiling detector for static input {}".format(self.input_size))
+            compiled = torch.compile(model, mode="reduce-overhead", dynamic=False)
+            # Compilation is lazy: run it now so a missing Triton or unsupported setup
+            # falls back to the eager model instead of failing the first video
+            try:
+                example = torch.zeros(self.batch_size, 3, *self.input_size, device="cuda",
+                                      dtype=torch.float16 if self.fp16 else torch.float32)
+                with torch.inference_mode():
+                    compiled(example)
+                model = compiled
+            except Exception as e:
+                logger.warning("torch.compile failed, using the eager detector: {}".format(e))
+    
         return model
-    def detect(self, img: np.ndarray) -> List[Tuple]:
-        """Detect objects in image"""
-        img_info = {"id": 0}
-        img_info["file_name"] = None
-        height, width = img.shape[:2]
-        img_info["height"] = height
-        img_info["width"] = width
+
+    def _load_openvino(self, model_path: str):
+        """Compile the OpenVINO IR for CPU inference, exporting it from the checkpoint when missing or stale"""
+        if ov is None:
+            return None
+    
+        # The IR lives next to the checkpoint it was exported from
+        ckpt_path = Path(model_path)
+        xml_path = ckpt_path.with_name(ckpt_path.stem + OPENVINO_IR_SUFFIX)
+        try:
+            if not xml_path.exists() or xml_path.stat().st_mtime < ckpt_path.stat().st_mtime:
+                logger.info("Exporting OpenVINO IR to {}".format(xml_path))
+                example = torch.zeros(1, 3, *self.input_size)
+                ov.save_model(ov.convert_model(self.model, example_input=example), str(xml_path))
+            compiled = ov.Core().compile_model(str(xml_path), "CPU", {"PERFORMANCE_HINT": "THROUGHPUT"})
+            logger.info("Using OpenVINO IR {} for CPU inference".format(xml_path))
+            return compiled
+        except Exception as e:
+            logger.warning("OpenVINO unavailable, using PyTorch on CPU: {}".format(e))
+            return None
+
+    def _setup_pipeline(self):
+        """Allocate double-buffered pinned/device inputs and streams used by enqueue_batch()"""
+        self._dtype = torch.float16 if self.fp16 else torch.float32
+        self._host_bufs = [self._alloc_input(self.batch_size) for _ in range(2)]
+        self._dev_bufs = [self._alloc_input(self.batch_size, "cuda") for _ in range(2)]
+        self._cast_bufs = [self._alloc_cast(dev) for dev in self._dev_bufs]
+        self._input_dev = self._alloc_input(self.batch_size, "cuda")
+        self._input_cast = self._alloc_cast(self._input_dev)
+        self._copy_done = [torch.cuda.Event() for _ in range(2)]
+        self._compute_done = [torch.cuda.Event() for _ in range(2)]
+        self._copy_stream = torch.cuda.Stream()
+        self._post_stream = torch.cuda.Stream()
+        self._slot = 0
+
+    def _alloc_input(self, batch_size: int, device: str = "cpu") -> torch.Tensor:
+        """Zeroed float32 (batch_size, 3, H, W) input tensor, pinned when it stages uploads to the GPU"""
+        shape = (batch_size, 3, *self.input_size)
+        if device == "cuda":
+            return torch.zeros(shape, dtype=torch.float32, device="cuda")
+        return torch.zeros(shape, dtype=torch.float32, pin_memory=self.device == "cuda")
+
+    def _alloc_cast(self, dev: torch.Tensor) -> torch.Tensor:
+        """Model-dtype counterpart of a float32 device buffer (the buffer itself when no cast is needed)"""
+        return dev if dev.dtype == self._dtype else torch.empty_like(dev, dtype=self._dtype)
+
+    def _upload(self, host: torch.Tensor, dev: torch.Tensor, cast: torch.Tensor) -> torch.Tensor:
+        """Copy float32 rows from pinned memory to the device, then cast them to the model dtype there"""
+        # Same-dtype copy from pinned memory is a plain async DMA; a dtype change here would
+        # make ATen convert on the CPU into a pageable temporary first
+        dev.copy_(host, non_blocking=True)
+        if cast is not dev:
+            cast.copy_(dev)
+        return cast
+
+    def _preprocess_into(self, imgs: List[np.ndarray], buf: torch.Tensor) -> List[float]:
+        """Letterbox each image into its row of buf and return the resize ratios"""
+        arr = buf.numpy()
+        ratios = []
+        for i, img in enumerate(imgs):
+            padded, ratio = preproc(img, self.input_size)
+            np.copyto(arr[i], padded)
+            ratios.append(ratio)
+        return ratios
+
+    def enqueue(self, img: np.ndarray):
+        """Start detection on img without waiting for it; collect results in order with poll()"""
+        self.enqueue_batch([img])
+
+    def enqueue_batch(self, imgs: List[np.ndarray]):
+        """Start detection on imgs, batch_size images per forward; collect per-image results in order with poll()"""
+        for start in range(0, len(imgs), self.batch_size):
+            self._enqueue_chunk(imgs[start:start + self.batch_size])
+
+    def _enqueue_chunk(self, imgs: List[np.ndarray]):
+        """Start one forward pass on at most batch_size images"""
+        n = len(imgs)
+        if self.device != "cuda":
+            inputs = self._input_buf[:n]
+            ratios = self._preprocess_into(imgs, inputs)
+            if self._ov_queue is not None:
+                # One async request per image; the callbacks fill the chunk's outputs in place
+                batch = _OVBatch(n)
+                for i, x in enumerate(inputs.numpy()):
+                    self._ov_queue.start_async({0: x[None]}, (batch, i))
+                self._pending.append((batch, ratios, None))
+                return
+            with torch.inference_mode():
+                self._pending.append((self._forward(inputs), ratios, None))
+            return
         
-        # Preprocess image
-        img, ratio = preproc(img, (640, 640))
-        img_info["ratio"] = ratio
-        img = torch.from_numpy(img).unsqueeze(0).float()
+        slot = self._slot
+        self._slot ^= 1
         
-        if self.device == "cuda":
-            img = img.cuda()
+        # Host slot is free once its previous copy finished; device slot once its forward did
+        self._copy_done[slot].synchronize()
+        host = self._host_bufs[slot]
+        ratios = self._preprocess_into(imgs, host)
+        with torch.cuda.stream(self._copy_stream):
+            self._copy_stream.wait_event(self._compute_done[slot])
+            dev = self._upload(host, self._dev_bufs[slot], self._cast_bufs[slot])
+            self._copy_done[slot].record(self._copy_stream)
         
-        # Forward pass
-        with torch.no_grad():
-            outputs = self.model(img)
+        # Forward on the default stream overlaps with the next batch's copy; rows past n
+        # only pad the batch to its fixed shape and are dropped before NMS
+        torch.cuda.current_stream().wait_event(self._copy_done[slot])
+        with torch.inference_mode():
+            outputs = self._forward(dev)[:n].clone()  # Compiled CUDA graphs reuse their output buffer
+        self._compute_done[slot].record()
+        self._pending.append((outputs, ratios, self._compute_done[slot]))
+
+    def poll(self) -> List[Tuple]:
+        """Return detections for the oldest image passed to enqueue()/enqueue_batch()"""
+        if not self._ready:
+            outputs, ratios, done = self._pending.popleft()
+            if isinstance(outputs, _OVBatch):
+                # Wait for this chunk only; later chunks keep running on the CPU streams
+                outputs.done.wait()
+                outputs = torch.from_numpy(np.concatenate(outputs.outputs))
+            if done is None:
+                self._ready.extend(self._postprocess(outputs, ratios))
+            else:
+                # NMS and the device-to-host copy run on their own stream, off the forward path
+                with torch.cuda.stream(self._post_stream):
+                    self._post_stream.wait_event(done)
+                    outputs.record_stream(self._post_stream)
+                    self._ready.extend(self._postprocess(outputs, ratios))
+        return self._ready.popleft()
+
+    def reset(self):
+        """Drop queued results that will never be polled (e.g. after a failed video)"""
+        if self._ov_queue is not None:
+            self._ov_queue.wait_all()
+        elif self.device == "cuda":
+            torch.cuda.synchronize()
+        self._pending.clear()
+        self._ready.clear()
+
+    @staticmethod
+    def _on_ov_done(request, userdata):
+        """AsyncInferQueue callback: copy the output out before the request is reused"""
+        batch, i = userdata
+        batch.outputs[i] = request.get_output_tensor(0).data.copy()
+        with batch.lock:
+            batch.remaining -= 1
+            if not batch.remaining:
+                batch.done.set()
+
+    def _forward(self, img: torch.Tensor) -> torch.Tensor:
+        """Raw model outputs for a preprocessed (B, 3, H, W) input"""
+        if self.ov_model is not None:
+            # The IR is exported with a static batch of one
+            return torch.from_numpy(np.concatenate([self.ov_model(x[None])[0] for x in img.numpy()]))
+        return self.model(img)
+
+    def _postprocess(self, outputs: torch.Tensor, ratios: List[float]) -> List[List[Tuple]]:
+        """Run NMS on raw batch outputs and convert them to per-image detection tuples in frame coordinates"""
+        with torch.inference_mode():
             outputs = postprocess(
                 outputs, 
                 len(self.class_names), 
                 conf_thre=DETECTION_THRESHOLD,
                 nms_thre=0.45
             )
-        
-        # Process detections
+            # Queue every image's device-to-host copy, then wait on the stream once
+            outputs = [None if output is None else output.float().to("cpu", non_blocking=True)
+                       for output in outputs]
+        if self.device == "cuda":
+            torch.cuda.current_stream().synchronize()
+        return [self._to_detections(output, ratio) for output, ratio in zip(outputs, ratios)]
+
+    def _to_detections(self, output: Optional[torch.Tensor], ratio: float) -> List[Tuple]:
+        """Convert one image's host-side NMS output to (x1, y1, x2, y2, score, cls_id, category) tuples"""
         detections = []
-        if outputs[0] is not None:
-            outputs = outputs[0].cpu().numpy()
-            bboxes = outputs[:, 0:4]
-            bboxes /= img_info["ratio"]
-            cls_ids = outputs[:, 6]
-            scores = outputs[:, 4] * outputs[:, 5]
+        if output is not None:
+            output = output.numpy()
+            cls_ids = output[:, 6].astype(np.int32)
+            cats = self.cls_to_cat[cls_ids]
+            keep = cats >= 0  # Filter by class
+            
+            bboxes = output[keep, 0:4]
+            np.multiply(bboxes, np.float32(1.0 / ratio), out=bboxes)  # Back to frame coordinates
+            scores = output[keep, 4] * output[keep, 5]
             
-            for i in range(len(bboxes)):
-                bbox = bboxes[i]
-                cls_id = int(cls_ids[i])
-                score = scores[i]
-                
-                # Filter by class
-                cls_name = self.cls_id_to_name[cls_id]
-                for category, ids in CLASS_IDS.items():
-                    if cls_id in ids:
-                        detections.append((
-                            bbox[0], bbox[1], bbox[2], bbox[3], 
-                            score, cls_id, category
-                        ))
-                        break
+            detections = [
+                (x1, y1, x2, y2, score, cls_id, self.categories[cat])
+                for (x1, y1, x2, y2), score, cls_id, cat in zip(
+                    bboxes.tolist(), scores.tolist(), cls_ids[keep].tolist(), cats[keep].tolist()
+                )
+            ]
+        
+        return detections
+
+    def detect(self, img: np.ndarray) -> List[Tuple]:
+        """Detect objects in image"""
+        return self.detect_batch([img])[0]
+
+    def detect_batch(self, imgs: List[np.ndarray]) -> List[List[Tuple]]:
+        """Detect objects in a batch of images, batch_size images per forward pass"""
+        detections = []
+        for start in range(0, len(imgs), self.batch_size):
+            detections.extend(self._detect_chunk(imgs[start:start + self.batch_size]))
+        return detections
+
+    def _detect_chunk(self, imgs: List[np.ndarray]) -> List[List[Tuple]]:
+        """Synchronously detect objects in at most batch_size images"""
+        n = len(imgs)
+        
+        # Preprocess straight into the preallocated input buffers
+        ratios = self._preprocess_into(imgs, self._input_buf)
+        inputs = self._input_buf[:n]
+        
+        if self.device == "cuda":
+            # Upload the whole padded buffer so the compiled graph always sees the same shape
+            inputs = self._upload(self._input_buf, self._input_dev, self._input_cast)
+        
+        # Forward pass
+        with torch.inference_mode():
+            outputs = self._forward(inputs)[:n]
         
-        return detections
\ No newline at end of file
+        return self._postprocess(outputs, ratios)
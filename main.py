@@ -1,110 +1,216 @@
 import cv2
 import time
+import numpy as np
 import logging
-import pandas as pd  # Add this import at the top
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, List
 from pathlib import Path
 from detectors.yolox_inference import YOLOXDetector
 from detectors.pothole_detector import PotholeDetector
 from trackers.bytetrack import BYTETracker
 from scoring.safety_score import compute_safety_score, analyze_frame_detections, generate_segment_report
-from utils.video_utils import read_video, get_video_properties, initialize_video_writer, draw_objects, draw_safety_score
-from utils.config import COLORS, POTHOLEDETECTION, create_roi_mask
+from utils.video_utils import (read_video, read_frame_batches, get_video_properties, initialize_video_writer,
+                               draw_objects, draw_safety_score, draw_text)
+from utils.config import COLORS, POTHOLEDETECTION, DETECT_STRIDE, PIPELINE_BATCH_SIZE, create_roi_mask
 
 logger = logging.getLogger(__name__)
 
+# Per-frame statistics are stored column-wise, one preallocated array per field
+# (timestamps are derived from the frame index once the video is done)
+FRAME_STAT_DTYPES = {
+    "vehicle": np.int16,
+    "pedestrian": np.int16,
+    "animal": np.int16,
+    "pothole": np.uint8,
+    "score": np.uint8  # 0-10
+}
+
+def _allocate_frame_stats(capacity: int) -> Dict[str, np.ndarray]:
+    """Allocate empty per-frame stat columns for capacity frames"""
+    return {name: np.zeros(capacity, dtype) for name, dtype in FRAME_STAT_DTYPES.items()}
+
+def _grow_frame_stats(stats: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Double the capacity of the stat columns (the container frame count can be short)"""
+    extra = max(len(stats["score"]), 256)
+    return {name: np.concatenate([col, np.zeros(extra, col.dtype)]) for name, col in stats.items()}
+
 class RoadSafetyScorer:
-    def __init__(self, model_path: str = "yolox_s.pth", device: str = "cuda", segment_size: float = 5.0):
-        self.detector = YOLOXDetector(model_path, device)
+    def __init__(self, model_path: str = "yolox_s.pth", device: str = "cuda", segment_size: float = 5.0,
+                 detect_stride: int = DETECT_STRIDE):
+        self.batch_size = PIPELINE_BATCH_SIZE
+        self.detect_stride = max(1, int(detect_stride))
+        # Detector frames per pipeline batch, rounded up; shorter batches are padded to it
+        self.detector = YOLOXDetector(model_path, device, batch_size=-(-self.batch_size // self.detect_stride))
         self.tracker = BYTETracker()
         
-        # Initialize pothole detector
+        # Initialize pothole detector, sized for the frames sampled from one pipeline batch
+        self.pothole_every = max(1, int(POTHOLEDETECTION['EVERY']))
         try:
             self.pothole_detector = PotholeDetector(
                 model_path=POTHOLEDETECTION['MODEL_PATH'],
                 input_size=POTHOLEDETECTION['INPUT_SIZE'],
-                threshold=POTHOLEDETECTION['THRESHOLD']
+                threshold=POTHOLEDETECTION['THRESHOLD'],
+                batch_size=-(-self.batch_size // self.pothole_every)
             )
         except Exception as e:
             logger.error(f"Pothole detector initialization failed: {str(e)}")
             self.pothole_detector = None
         
-        self.frame_stats = []
+        self.frame_stats = {}
         self.segment_size = segment_size
+        self._last_pothole = False
+        # Pothole batches run on this worker while the main thread drives the detector
+        self._pool = ThreadPoolExecutor(max_workers=1)
+
+    def _setup_roi(self, width: int, height: int):
+        """Precompute the ROI bounding box, cropped mask and masking buffer for the detector"""
+        roi_mask = create_roi_mask(width, height)
+        x, y, w, h = cv2.boundingRect(roi_mask)
+        self._roi_rect = (x, y, w, h)
+        self._roi_mask = roi_mask[y:y + h, x:x + w]
+        if cv2.countNonZero(self._roi_mask) == w * h:
+            self._roi_bufs = None  # Rectangular ROI: a crop is enough, nothing to mask
+        else:
+            self._roi_bufs = np.zeros((0, h, w, 3), dtype=np.uint8)
+
+    def _enqueue_detections(self, frames: List[np.ndarray]):
+        """Queue the ROIs of frames on the detector as one batch without waiting for the result"""
+        x, y, w, h = self._roi_rect
+        rois = [frame[y:y + h, x:x + w] for frame in frames]
+        if self._roi_bufs is not None:
+            if len(self._roi_bufs) < len(rois):
+                self._roi_bufs = np.zeros((len(rois), h, w, 3), dtype=np.uint8)
+            for roi, buf in zip(rois, self._roi_bufs):
+                cv2.bitwise_and(roi, roi, dst=buf, mask=self._roi_mask)
+            rois = list(self._roi_bufs[:len(rois)])
+        self.detector.enqueue_batch(rois)
+
+    def _collect_detections(self) -> List:
+        """Detections for the oldest queued frame, mapped back to frame coordinates"""
+        x, y = self._roi_rect[:2]
+        detections = self.detector.poll()
+        if x or y:
+            detections = [(x1 + x, y1 + y, x2 + x, y2 + y, *rest) for x1, y1, x2, y2, *rest in detections]
+        return detections
+
+    def _detect_potholes(self, frames: List, first_idx: int) -> List[bool]:
+        """Classify every pothole_every-th frame of a batch in one model call, holding the last label in between"""
+        if not self.pothole_detector:
+            return [False] * len(frames)
+        sampled = [i for i in range(len(frames)) if (first_idx + i) % self.pothole_every == 0]
+        try:
+            labels, _ = self.pothole_detector.predict_batch([frames[i] for i in sampled]) if sampled else ([], [])
+        except Exception as e:
+            logger.error("Pothole detection error: %s", e)
+            labels = [-1] * len(sampled)
+        
+        sampled_labels = dict(zip(sampled, labels))
+        flags = []
+        for i in range(len(frames)):
+            if i in sampled_labels:
+                self._last_pothole = bool(sampled_labels[i] == 1)
+            flags.append(self._last_pothole)
+        return flags
+
+    def _finish_batch(self, batch: List, pothole_future, frame_idx: int, stats: Dict[str, np.ndarray],
+                      out_writer, width: int) -> Dict[str, np.ndarray]:
+        """Track, score, annotate and write a batch whose detections were queued earlier"""
+        pothole_flags = pothole_future.result()
+
+        for frame, pothole_status in zip(batch, pothole_flags):
+            # Process frame: detect every detect_stride frames, predict tracks in between
+            if frame_idx % self.detect_stride == 0:
+                tracks = self.tracker.update(self._collect_detections())
+            else:
+                tracks = self.tracker.track_only()
+
+            # Get counts and score
+            counts = analyze_frame_detections(tracks, pothole_status)
+            score = compute_safety_score(
+                counts['vehicle'],
+                counts['pedestrian'],
+                counts['animal'],
+                counts['pothole']
+            )
+
+            # Store frame stats
+            if frame_idx == len(stats["score"]):
+                stats = _grow_frame_stats(stats)
+            stats["vehicle"][frame_idx] = counts['vehicle']
+            stats["pedestrian"][frame_idx] = counts['pedestrian']
+            stats["animal"][frame_idx] = counts['animal']
+            stats["pothole"][frame_idx] = pothole_status
+            stats["score"][frame_idx] = score
+
+            # Visualization; frames without objects only get the score overlay
+            if len(tracks):
+                frame = draw_objects(frame, tracks)
+            frame = draw_safety_score(frame, score)
+            if pothole_status:
+                frame = draw_text(frame, "POTHOLE DETECTED", (width//2, 50), 
+                                  1, COLORS['pothole'], 2)
+            out_writer.write(frame)
+            frame_idx += 1
+
+        return stats
 
     def process_video(self, input_path: str, output_path: str) -> dict:
         """Process video with improved score tracking"""
+        import pandas as pd  # Only needed for the report; keeps module import light
+
         result = {
             "output_video": output_path,
             "report": pd.DataFrame(),
             "average_score": 0.0,
             "processing_time": 0.0,
             "segment_size": self.segment_size,
-            "frame_stats": [],
+            "frame_stats": {},
             "error": None
         }
 
+        cap = out_writer = frames = None
         try:
             cap = read_video(input_path)
-            if not cap.isOpened():
+            if cap is None:
                 result["error"] = "Could not open video file"
                 return result
 
             width, height, frame_count, fps = get_video_properties(cap)
             out_writer = initialize_video_writer(output_path, width, height, fps)
+            self._setup_roi(width, height)
             
             start_time = time.time()
+            self._last_pothole = False
             frame_idx = 0
+            frame_period = 1.0 / (fps if fps > 0 else 30)  # Fallback to 30fps
+            stats = _allocate_frame_stats(max(frame_count, 0))
             
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                # Process frame
-                detections = self.detector.detect(frame)
-                tracks = self.tracker.update(detections)
-
-                # Pothole detection
-                pothole_status = False
-                if self.pothole_detector:
-                    try:
-                        pothole_label, pothole_prob = self.pothole_detector.predict(frame)
-                        pothole_status = pothole_label is not None and pothole_label == 1
-                    except Exception as e:
-                        print(f"Pothole detection error: {str(e)}")
-
-                # Get counts and score
-                counts = analyze_frame_detections(tracks, pothole_status)
-                score = compute_safety_score(
-                    counts['vehicle'],
-                    counts['pedestrian'],
-                    counts['animal'],
-                    counts['pothole']
-                )
-
-                # Store frame stats with timestamp
-                self.frame_stats.append({
-                    "frame": frame_idx,
-                    "vehicle": int(counts['vehicle']),
-                    "pedestrian": int(counts['pedestrian']),
-                    "animal": int(counts['animal']),
-                    "pothole": int(pothole_status),
-                    "score": float(score),
-                    "timestamp": frame_idx / fps if fps > 0 else frame_idx / 30  # Fallback to 30fps
-                })
-
-                # Visualization
-                frame = draw_objects(frame, detections, tracks)
-                frame = draw_safety_score(frame, score)
-                if pothole_status:
-                    cv2.putText(frame, "POTHOLE DETECTED", (width//2, 50), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, COLORS['pothole'], 2)
-                out_writer.write(frame)
-                frame_idx += 1
+            read_idx = 0
+            pending = None  # Previous batch, waiting for its detections
+            frames = read_frame_batches(cap, self.batch_size)
+            for batch in frames:
+                # Queue this batch on both models before finishing the previous one, so its
+                # upload and forward overlap the previous batch's NMS, tracking and drawing
+                pothole_future = self._pool.submit(self._detect_potholes, batch, read_idx)
+                self._enqueue_detections([frame for i, frame in enumerate(batch)
+                                          if (read_idx + i) % self.detect_stride == 0])
+                read_idx += len(batch)
+
+                if pending is not None:
+                    stats = self._finish_batch(*pending, frame_idx, stats, out_writer, width)
+                    frame_idx += len(pending[0])
+                pending = (batch, pothole_future)
+
+            if pending is not None:
+                stats = self._finish_batch(*pending, frame_idx, stats, out_writer, width)
+                frame_idx += len(pending[0])
 
             # Generate final report
-            if self.frame_stats:
+            self.frame_stats = {name: col[:frame_idx] for name, col in stats.items()}
+            self.frame_stats["frame"] = np.arange(frame_idx)
+            # Kept in float64: float32 rounding moves frames across segment boundaries on long videos
+            self.frame_stats["timestamp"] = self.frame_stats["frame"] * frame_period
+            if frame_idx:
                 result["report"] = generate_segment_report(self.frame_stats, fps, self.segment_size)
                 if not result["report"].empty:
                     result["average_score"] = result["report"]["score"].mean()
@@ -115,4 +221,17 @@ class RoadSafetyScorer:
 
         except Exception as e:
             result["error"] = str(e)
-            return result
\ No newline at end of file
+            return result
+
+        finally:
+            # Stop the reader thread, then close the capture and finalise the writer (also on errors)
+            if frames is not None:
+                frames.close()
+            self.detector.reset()
+            if cap is not None:
+                cap.release()
+            if out_writer is not None:
+                try:
+                    out_writer.release()
+                except Exception as e:
+                    result["error"] = result["error"] or str(e)
\ No newline at end of file
@@ -1,5 +1,26 @@
-import pandas as pd
-from typing import List, Tuple, Dict
+import numpy as np
+from typing import Dict, TYPE_CHECKING
+from utils.config import CATEGORIES
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+def _build_score_lut() -> np.ndarray:
+    """
+    Score for every (vehicle, pedestrian, animal, pothole) combination up to the
+    counts where each term saturates; larger counts index the last entry.
+    """
+    vehicle, pedestrian, animal, pothole = np.ogrid[:21, :7, :3, :2]
+    score = (np.minimum(vehicle // 5, 4)        # Max 4 points for vehicles
+             + np.minimum(pedestrian // 2, 3)   # Max 3 points for pedestrians
+             + np.minimum(animal, 2)            # Max 2 points for animals
+             + pothole)                         # 1 point for pothole
+    return np.minimum(score, 10).astype(np.int8)  # Cap at 10
+
+
+SCORE_LUT = _build_score_lut()
+_LUT_CAPS = [n - 1 for n in SCORE_LUT.shape[:3]]
+
 
 def compute_safety_score(vehicle_count: int, pedestrian_count: int,
                          animal_count: int, pothole_detected: bool = False) -> int:
@@ -7,66 +28,68 @@ def compute_safety_score(vehicle_count: int, pedestrian_count: int,
     Compute road safety score based on object counts and pothole presence.
     Score ranges from 0 (safest) to 10 (most dangerous).
     """
-    score = 0
-    score += min(vehicle_count // 5, 4)        # Max 4 points for vehicles
-    score += min(pedestrian_count // 2, 3)     # Max 3 points for pedestrians
-    score += min(animal_count, 2)              # Max 2 points for animals
-    if pothole_detected:
-        score += 1                             # 1 point for pothole
-    return min(score, 10)                      # Cap at 10
+    return int(SCORE_LUT[min(vehicle_count, _LUT_CAPS[0]), min(pedestrian_count, _LUT_CAPS[1]),
+                         min(animal_count, _LUT_CAPS[2]), int(bool(pothole_detected))])
+
+
+def compute_safety_scores(vehicle_counts: np.ndarray, pedestrian_counts: np.ndarray,
+                          animal_counts: np.ndarray, pothole_detected: np.ndarray) -> np.ndarray:
+    """
+    Vectorised compute_safety_score over equal-length arrays of counts.
+    Returns an int array of scores with the same rules and caps.
+    """
+    return SCORE_LUT[
+        np.minimum(vehicle_counts, _LUT_CAPS[0]),
+        np.minimum(pedestrian_counts, _LUT_CAPS[1]),
+        np.minimum(animal_counts, _LUT_CAPS[2]),
+        np.asarray(pothole_detected).astype(bool).astype(np.intp)
+    ].astype(np.int64)
 
 
-def analyze_frame_detections(tracks: List[Tuple], pothole_status: bool = False) -> Dict[str, int]:
+def analyze_frame_detections(tracks: np.ndarray, pothole_status: bool = False) -> Dict[str, int]:
     """
     Count different object types in the current frame.
+    tracks is the tracker's (N, 6) array whose last column is the category index.
     Returns dictionary with counts for each category.
     """
-    counts = {
-        'vehicle': 0,
-        'pedestrian': 0,
-        'animal': 0,
-        'pothole': int(pothole_status)
-    }
-
-    for track in tracks:
-        _, _, _, _, _, cls_name = track
-        if cls_name in counts:
-            counts[cls_name] += 1
-
+    category_counts = np.bincount(tracks[:, 5].astype(np.int64), minlength=len(CATEGORIES))
+    counts = dict(zip(CATEGORIES, category_counts.tolist()))
+    counts['pothole'] = int(pothole_status)
     return counts
 
 
-def generate_segment_report(frame_stats: List[Dict], fps: float, segment_size: float = 5.0) -> pd.DataFrame:
+def generate_segment_report(frame_stats: Dict[str, np.ndarray], fps: float, segment_size: float = 5.0) -> "pd.DataFrame":
     """
     Generate a report DataFrame with segment-based analysis.
+    frame_stats holds one array per column, indexed by frame.
     Each segment is 'segment_size' seconds long.
     """
-    df = pd.DataFrame(frame_stats)
-
-    # Ensure required columns
-    required_cols = ['vehicle', 'pedestrian', 'animal', 'pothole', 'timestamp']
-    for col in required_cols:
-        if col not in df.columns:
-            df[col] = 0  # Fill missing with zero
-
-    df['segment'] = (df['timestamp'] // segment_size).astype(int)
-
-    segment_df = df.groupby('segment').agg({
-        'vehicle': 'max',
-        'pedestrian': 'max',
-        'animal': 'max',
-        'pothole': 'max',
-        'timestamp': 'first'
-    }).reset_index()
-
-    segment_df['score'] = segment_df.apply(
-        lambda x: compute_safety_score(
-            int(x['vehicle']),
-            int(x['pedestrian']),
-            int(x['animal']),
-            bool(x['pothole'])
-        ),
-        axis=1
+    import pandas as pd
+
+    n_frames = len(next(iter(frame_stats.values()))) if frame_stats else 0
+    count_cols = ['vehicle', 'pedestrian', 'animal', 'pothole']
+
+    def column(name):
+        return np.asarray(frame_stats.get(name, np.zeros(n_frames, dtype=np.int64)))  # Fill missing with zero
+
+    timestamps = column('timestamp')
+    segments = (timestamps // segment_size).astype(np.int64)
+
+    # Frames are in time order, so each segment is a contiguous run starting where the index changes
+    if n_frames:
+        starts = np.flatnonzero(np.diff(segments, prepend=segments[0] - 1))
+        report = {name: np.maximum.reduceat(column(name), starts) for name in count_cols}
+    else:
+        starts = np.zeros(0, dtype=np.int64)
+        report = {name: column(name) for name in count_cols}
+
+    segment_df = pd.DataFrame({'segment': segments[starts], **report, 'timestamp': timestamps[starts]})
+
+    segment_df['score'] = compute_safety_scores(
+        segment_df['vehicle'].to_numpy(),
+        segment_df['pedestrian'].to_numpy(),
+        segment_df['animal'].to_numpy(),
+        segment_df['pothole'].to_numpy()
     )
 
     return segment_df
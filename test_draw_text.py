@@ -0,0 +1,14 @@
+import cv2
+import numpy as np
+from utils.video_utils import draw_text, FONT, SCORE_COLOR
+
+# draw_text must stay pixel-identical to cv2.putText, inside the frame and where the text is clipped
+rng = np.random.default_rng(0)
+origins = [(20, 40), (-15, 5), (600, 470)] + [tuple(o) for o in rng.integers(-300, 700, (2000, 2)).tolist()]
+for text in [f"Safety Score: {s}/10" for s in range(11)]:
+    for org in origins:
+        expected = np.zeros((480, 640, 3), dtype=np.uint8)
+        cv2.putText(expected, text, org, FONT, 1, SCORE_COLOR, 2)
+        actual = draw_text(np.zeros_like(expected), text, org, 1, SCORE_COLOR, 2)
+        assert np.array_equal(actual, expected), (text, org)
+print("draw_text matches cv2.putText")
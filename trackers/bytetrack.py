@@ -2,99 +2,124 @@ import numpy as np
 import logging
 logger = logging.getLogger(__name__)
 from typing import List, Tuple
-from utils.config import TRACKING_THRESHOLD
+from scipy.optimize import linear_sum_assignment
+from utils.config import TRACKING_THRESHOLD, CATEGORIES
+
+def iou_matrix(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """Pairwise Intersection over Union between (N, 4) and (M, 4) xyxy boxes, as an (N, M) array"""
+    # Calculate intersection area
+    x1 = np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+    y1 = np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+    x2 = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2])
+    y2 = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3])
+    inter_area = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    # Calculate union area
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    union_area = area1[:, None] + area2[None, :] - inter_area
+
+    return np.divide(inter_area, union_area, out=np.zeros_like(inter_area), where=union_area > 0)
 
 class BYTETracker:
     def __init__(self, track_thresh: float = 0.5, match_thresh: float = 0.8):
         self.track_thresh = track_thresh
         self.match_thresh = match_thresh
-        self.tracked_objects = {}
         self.next_id = 1
-    
-    def update(self, detections: List[Tuple]) -> List[Tuple]:
-        """Update tracker with new detections"""
-        active_tracks = []
-        
-        # First pass: update existing tracks with high confidence detections
-        for det in detections:
-            x1, y1, x2, y2, conf, cls_id, cls_name = det
-            if conf < self.track_thresh:
-                continue
-                
-            matched = False
-            for obj_id, obj in self.tracked_objects.items():
-                if obj['cls_name'] != cls_name:
-                    continue
-                    
-                # Simple IoU matching (can be replaced with more sophisticated metric)
-                iou = self._calculate_iou(det, obj['last_detection'])
-                if iou > self.match_thresh:
-                    obj['last_detection'] = det
-                    obj['misses'] = 0
-                    active_tracks.append((*det[:4], obj_id, cls_name))
-                    matched = True
-                    break
-            
-            # If no match found, create new track
-            if not matched:
-                self.tracked_objects[self.next_id] = {
-                    'last_detection': det,
-                    'cls_name': cls_name,
-                    'misses': 0
-                }
-                active_tracks.append((*det[:4], self.next_id, cls_name))
-                self.next_id += 1
-        
-        # Second pass: try to match low confidence detections
-        for det in detections:
-            x1, y1, x2, y2, conf, cls_id, cls_name = det
-            if conf >= self.track_thresh:
-                continue
-                
-            best_match = None
-            best_iou = 0
-            for obj_id, obj in self.tracked_objects.items():
-                if obj['cls_name'] != cls_name:
+        self.category_index = {name: i for i, name in enumerate(CATEGORIES)}
+
+        # Track state, one row per track
+        self._boxes = np.zeros((0, 4), dtype=np.float32)     # Last box, detected or predicted
+        self._seen = np.zeros((0, 4), dtype=np.float32)      # Last detected box
+        self._velocity = np.zeros((0, 4), dtype=np.float32)  # Per-frame box motion
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._cats = np.zeros(0, dtype=np.int32)
+        self._misses = np.zeros(0, dtype=np.int32)
+        self._since_seen = np.zeros(0, dtype=np.int32)
+
+    def update(self, detections: List[Tuple]) -> np.ndarray:
+        """Update tracker with new detections; returns an (N, 6) array of x1, y1, x2, y2, track_id, category"""
+        det_boxes = np.array([det[:4] for det in detections], dtype=np.float32).reshape(-1, 4)
+        det_conf = np.array([det[4] for det in detections], dtype=np.float32)
+        det_cats = np.array([self.category_index[det[6]] for det in detections], dtype=np.int32)
+        high = det_conf >= self.track_thresh
+
+        # IoU of every detection against every track, same category only
+        track_of = np.full(len(detections), -1, dtype=np.int64)
+        if len(self._ids):
+            iou = iou_matrix(det_boxes, self._boxes)
+            iou[det_cats[:, None] != self._cats[None, :]] = 0
+
+            # Optimal one-to-one assignment, high confidence detections first; low confidence
+            # detections can then only recover tracks the first pass left unmatched
+            free = np.ones(len(self._ids), dtype=bool)
+            for tier in (high, ~high):
+                dets, trks = np.flatnonzero(tier), np.flatnonzero(free)
+                if not len(dets) or not len(trks):
                     continue
-                    
-                iou = self._calculate_iou(det, obj['last_detection'])
-                if iou > best_iou and iou > self.match_thresh:
-                    best_iou = iou
-                    best_match = obj_id
-            
-            if best_match is not None:
-                self.tracked_objects[best_match]['last_detection'] = det
-                active_tracks.append((*det[:4], best_match, cls_name))
-        
-        # Remove lost tracks
-        lost_ids = []
-        for obj_id, obj in self.tracked_objects.items():
-            if obj_id not in [t[4] for t in active_tracks]:
-                obj['misses'] += 1
-                if obj['misses'] > 5:  # Remove after 5 consecutive misses
-                    lost_ids.append(obj_id)
-        
-        for obj_id in lost_ids:
-            del self.tracked_objects[obj_id]
-        
-        return active_tracks
-    
-    def _calculate_iou(self, det1, det2):
-        """Calculate Intersection over Union between two detections"""
-        box1 = det1[:4]
-        box2 = det2[:4]
-        
-        # Calculate intersection area
-        x1 = max(box1[0], box2[0])
-        y1 = max(box1[1], box2[1])
-        x2 = min(box1[2], box2[2])
-        y2 = min(box1[3], box2[3])
-        
-        inter_area = max(0, x2 - x1) * max(0, y2 - y1)
-        
-        # Calculate union area
-        box1_area = (box1[2] - box1[0]) * (box1[3] - box1[1])
-        box2_area = (box2[2] - box2[0]) * (box2[3] - box2[1])
-        union_area = box1_area + box2_area - inter_area
-        
-        return inter_area / union_area if union_area > 0 else 0
\ No newline at end of file
+                det_idx, trk_idx = linear_sum_assignment(iou[np.ix_(dets, trks)], maximize=True)
+                ok = iou[dets[det_idx], trks[trk_idx]] > self.match_thresh
+                track_of[dets[det_idx[ok]]] = trks[trk_idx[ok]]
+                free[trks[trk_idx[ok]]] = False
+
+        matched = track_of >= 0
+        rows = track_of[matched]
+        out_ids = np.zeros(len(detections), dtype=np.int64)
+        out_ids[matched] = self._ids[rows]
+
+        # Refresh matched tracks and re-estimate their per-frame velocity
+        steps = (self._since_seen[rows] + 1)[:, None]
+        self._velocity[rows] = (det_boxes[matched] - self._seen[rows]) / steps
+        self._boxes[rows] = det_boxes[matched]
+        self._seen[rows] = det_boxes[matched]
+        self._since_seen[rows] = 0
+        self._misses[rows] = 0
+
+        # Remove lost tracks after 5 consecutive misses
+        lost = np.ones(len(self._ids), dtype=bool)
+        lost[rows] = False
+        self._misses[lost] += 1
+        self._since_seen[lost] += 1
+        self._keep(self._misses <= 5)
+
+        # Unmatched high confidence detections start new tracks
+        new = high & ~matched
+        n_new = int(new.sum())
+        out_ids[new] = np.arange(self.next_id, self.next_id + n_new)
+        self.next_id += n_new
+        self._boxes = np.concatenate([self._boxes, det_boxes[new]])
+        self._seen = np.concatenate([self._seen, det_boxes[new]])
+        self._velocity = np.concatenate([self._velocity, np.zeros((n_new, 4), dtype=np.float32)])
+        self._ids = np.concatenate([self._ids, out_ids[new]])
+        self._cats = np.concatenate([self._cats, det_cats[new]])
+        self._misses = np.concatenate([self._misses, np.zeros(n_new, dtype=np.int32)])
+        self._since_seen = np.concatenate([self._since_seen, np.zeros(n_new, dtype=np.int32)])
+
+        # High confidence tracks first, then low confidence matches
+        emit = matched | new
+        order = np.concatenate([np.flatnonzero(high & emit), np.flatnonzero(~high & emit)])
+        return self._as_array(det_boxes[order], out_ids[order], det_cats[order])
+
+    def track_only(self) -> np.ndarray:
+        """Advance tracks one frame with a constant-velocity model, without detections"""
+        # Every live track moves and ages, so a track that missed a detector pass keeps its
+        # predicted position and update() measures its velocity over the real frame gap
+        self._boxes += self._velocity
+        self._since_seen += 1
+        active = self._misses == 0
+        return self._as_array(self._boxes[active], self._ids[active], self._cats[active])
+
+    def _keep(self, mask: np.ndarray):
+        """Drop the tracks whose rows are False in mask"""
+        self._boxes = self._boxes[mask]
+        self._seen = self._seen[mask]
+        self._velocity = self._velocity[mask]
+        self._ids = self._ids[mask]
+        self._cats = self._cats[mask]
+        self._misses = self._misses[mask]
+        self._since_seen = self._since_seen[mask]
+
+    @staticmethod
+    def _as_array(boxes: np.ndarray, ids: np.ndarray, cats: np.ndarray) -> np.ndarray:
+        """Stack boxes, track ids and categories into an (N, 6) float32 array"""
+        return np.column_stack([boxes, ids, cats]).astype(np.float32)
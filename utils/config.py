@@ -15,19 +15,35 @@ CLASS_IDS = {
     'pedestrian': [0],            # person
     'animal': list(range(15, 24)) # various animals
 }
+CATEGORIES = list(CLASS_IDS.keys())  # Category index order used in detector and tracker outputs
 
 
 # Add pothole detection parameters
 POTHOLEDETECTION = {
     'MODEL_PATH': 'pothole.h5',
     'INPUT_SIZE': 300,
-    'THRESHOLD': 0.9
+    'THRESHOLD': 0.9,
+    'EVERY': 5  # Classify every Nth frame and hold the label in between
 }
 # config.py - Add these new parameters
 # utils/config.py
 # Detection thresholds
 DETECTION_THRESHOLD = 0.5
 TRACKING_THRESHOLD = 0.3
+DETECT_STRIDE = 3  # Run the detector every Nth frame and predict tracks in between
+PIPELINE_BATCH_SIZE = 16  # Frames read and processed together (one detector and one pothole call per batch)
+
+# YOLOX inference parameters
+DETECTOR_INPUT_SIZE = (640, 640)  # Every frame is letterboxed to this fixed shape
+COMPILE_DETECTOR = True           # torch.compile the detector for that shape (torch>=2.0, CUDA only)
+DETECTOR_FP16 = True              # Run the detector in half precision on CUDA
+OPENVINO_IR_SUFFIX = '_openvino.xml'  # CPU IR saved next to the checkpoint (re-exported when older than it)
+
+# Output video encoding
+VIDEO_ENCODER = 'h264_nvenc'  # PyAV encoder for the annotated video
+# OpenCV GStreamer NVENC pipeline tried next, then FALLBACK_VIDEO_ENCODER, then OpenCV mp4v
+GSTREAMER_ENCODER_PIPELINE = 'appsrc ! videoconvert ! nvh264enc ! h264parse ! qtmux ! filesink location="{path}"'
+FALLBACK_VIDEO_ENCODER = ('libx264', {'preset': 'ultrafast'})
 
 # Road detection parameters
 ROAD_BOX_HEIGHT_RATIO = 0.4  # Height of road box as ratio of frame height
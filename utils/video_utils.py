@@ -1,18 +1,85 @@
 import cv2
 import numpy as np
 import logging
+import queue
+import threading
+from fractions import Fraction
+from functools import lru_cache
 logger = logging.getLogger(__name__)
-from typing import Tuple, Optional
-from .config import COLORS
+from typing import Iterator, List, Tuple, Optional
+from .config import (COLORS, CATEGORIES, VIDEO_ENCODER, GSTREAMER_ENCODER_PIPELINE,
+                     FALLBACK_VIDEO_ENCODER)
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# Drawing constants, resolved once instead of per call
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+DEFAULT_COLOR = (255, 255, 255)
+SCORE_COLOR = (0, 0, 255)
 
 def read_video(video_path: str):
-    """Read video file and return video capture object"""
-    cap = cv2.VideoCapture(video_path)
+    """Read video file and return video capture object (hardware decode when available)"""
+    # Let the FFmpeg backend pick NVDEC/VAAPI/D3D11; it decodes in software if none is usable
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG,
+                           [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+    if not cap.isOpened():
+        cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         logger.error(f"Error opening video file: {video_path}")
         return None
     return cap
 
+def read_frame_batches(cap, batch_size: int, prefetch: int = 2) -> Iterator[List[np.ndarray]]:
+    """Yield lists of up to batch_size consecutive frames until the video ends
+    
+    Frames are decoded on a background thread, up to prefetch batches ahead of the consumer.
+    Closing the generator (or abandoning it on an error) stops and joins that thread;
+    a read error on that thread is re-raised to the consumer instead of ending the video early.
+    """
+    batches = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    
+    def _read():
+        batch = []
+        try:
+            while not stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                batch.append(frame)
+                if len(batch) == batch_size:
+                    batches.put(batch)
+                    batch = []
+            if batch and not stop.is_set():
+                batches.put(batch)
+        except Exception as e:
+            batches.put(e)  # Handed to the consumer so a failing video is not scored as complete
+        finally:
+            batches.put(None)  # End of video
+    
+    reader = threading.Thread(target=_read, daemon=True)
+    reader.start()
+    try:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            yield batch
+    finally:
+        # Drain the queue so a reader blocked on put() wakes up and sees the stop flag
+        stop.set()
+        while reader.is_alive():
+            try:
+                batches.get(timeout=0.05)
+            except queue.Empty:
+                pass
+        reader.join()
+
 def get_video_properties(cap) -> Tuple[int, int, int, float]:
     """Get video properties (width, height, frame count, fps)"""
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
@@ -21,41 +88,138 @@ def get_video_properties(cap) -> Tuple[int, int, int, float]:
     fps = cap.get(cv2.CAP_PROP_FPS)
     return width, height, frame_count, fps
 
+class AVVideoWriter:
+    """cv2.VideoWriter-style writer that encodes through a PyAV (FFmpeg) codec such as h264_nvenc"""
+    def __init__(self, output_path: str, width: int, height: int, fps: float, codec: str = VIDEO_ENCODER,
+                 options: Optional[dict] = None):
+        self._container = av.open(output_path, mode="w")
+        try:
+            self._stream = self._container.add_stream(codec, rate=Fraction(fps).limit_denominator(1001))
+            self._stream.width = width
+            self._stream.height = height
+            self._stream.pix_fmt = "yuv420p"
+            self._stream.options = options or {}
+            self._stream.codec_context.open()  # Fail here, not on the first frame, if the codec is unusable
+        except Exception:
+            self._container.close()
+            raise
+
+    def write(self, frame: np.ndarray):
+        video_frame = av.VideoFrame.from_ndarray(frame, format="bgr24")
+        for packet in self._stream.encode(video_frame):
+            self._container.mux(packet)
+
+    def release(self):
+        for packet in self._stream.encode():  # Flush delayed frames
+            self._container.mux(packet)
+        self._container.close()
+
+class QueuedVideoWriter:
+    """Runs a writer's write() on a background thread so encoding overlaps the next frame's work"""
+    def __init__(self, writer, maxsize: int = 8):
+        self._writer = writer
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self._error is None:
+                try:
+                    self._writer.write(frame)
+                except Exception as e:
+                    self._error = e
+
+    def write(self, frame: np.ndarray):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(frame)
+
+    def release(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._writer.release()
+        if self._error is not None:
+            raise self._error
+
 def initialize_video_writer(output_path: str, width: int, height: int, fps: float):
-    """Initialize video writer for output"""
+    """Initialize a threaded video writer for output, preferring hardware (NVENC) encoders"""
+    if av is not None and fps > 0:
+        try:
+            return QueuedVideoWriter(AVVideoWriter(output_path, width, height, fps))
+        except Exception as e:
+            logger.warning(f"{VIDEO_ENCODER} unavailable, trying GStreamer NVENC: {e}")
+    
+    # Only opens when OpenCV was built with GStreamer and the nvh264enc element is installed
+    pipeline = GSTREAMER_ENCODER_PIPELINE.format(path=output_path)
+    writer = cv2.VideoWriter(pipeline, cv2.CAP_GSTREAMER, 0, fps, (width, height), True)
+    if writer.isOpened():
+        return QueuedVideoWriter(writer)
+    
+    if av is not None and fps > 0:
+        codec, options = FALLBACK_VIDEO_ENCODER
+        try:
+            return QueuedVideoWriter(AVVideoWriter(output_path, width, height, fps, codec, options))
+        except Exception as e:
+            logger.warning(f"{codec} unavailable, falling back to OpenCV writer: {e}")
+    
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    return cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-
-def draw_objects(frame, detections, tracks=None):
-    """Draw detected objects and tracks on frame"""
-    for det in detections:
-        x1, y1, x2, y2, conf, cls_id, cls_name = det
-        color = COLORS.get(cls_name, (255, 255, 255))
-        
-        # Draw bounding box
-        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-        
-        # Draw label
-        label = f"{cls_name} {conf:.2f}"
-        cv2.putText(frame, label, (int(x1), int(y1) - 10), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-    
-    if tracks:
-        for track in tracks:
-            x1, y1, x2, y2, track_id, cls_name = track
-            color = COLORS.get(cls_name, (255, 255, 255))
-            
-            # Draw bounding box with track ID
-            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-            label = f"{cls_name} ID:{track_id}"
-            cv2.putText(frame, label, (int(x1), int(y1) - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return QueuedVideoWriter(cv2.VideoWriter(output_path, fourcc, fps, (width, height)))
+
+def draw_objects(frame, tracks):
+    """Draw tracked objects (the tracker's (N, 6) array) on frame"""
+    if not len(tracks):
+        return frame
+    
+    # Cast every box to int once; each track's box and label are still drawn in turn so
+    # overlapping tracks stack exactly as before
+    boxes = tracks[:, :4].astype(np.int32).tolist()
+    track_ids = tracks[:, 4].astype(np.int64).tolist()
+    categories = tracks[:, 5].astype(np.int64).tolist()
+    
+    for (x1, y1, x2, y2), track_id, category in zip(boxes, track_ids, categories):
+        cls_name = CATEGORIES[category]
+        color = COLORS.get(cls_name, DEFAULT_COLOR)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"{cls_name} ID:{track_id}", (x1, y1 - 10), FONT, 0.5, color, 2)
+    
+    return frame
+
+@lru_cache(maxsize=64)
+def _text_mask(text: str, scale: float, thickness: int) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Rasterise text once into a boolean mask; returns the mask and the text origin inside it"""
+    (w, h), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+    # Hershey glyphs such as '/' reach past the reported size, so draw with a wide margin
+    # and crop to the pixels actually set
+    margin = h + thickness
+    canvas = np.zeros((h + baseline + 2 * margin, w + 2 * margin), dtype=np.uint8)
+    org = (margin, margin + h)
+    cv2.putText(canvas, text, org, FONT, scale, 255, thickness)
+    ys, xs = np.nonzero(canvas)
+    if not len(ys):
+        return np.zeros((0, 0), dtype=bool), (0, 0)
+    y0, x0 = ys.min(), xs.min()
+    return canvas[y0:ys.max() + 1, x0:xs.max() + 1].astype(bool), (org[0] - x0, org[1] - y0)
+
+def draw_text(frame, text: str, org: Tuple[int, int], scale: float, color, thickness: int):
+    """cv2.putText equivalent that rasterises each distinct text once and then only blits it"""
+    mask, (ox, oy) = _text_mask(text, scale, thickness)
+    x0, y0 = org[0] - ox, org[1] - oy
+    x1, y1 = x0 + mask.shape[1], y0 + mask.shape[0]
+    
+    # OpenCV clips strokes before rasterising them, so text crossing a frame edge does not
+    # match a cropped mask; draw that text directly
+    if x0 < 0 or y0 < 0 or x1 > frame.shape[1] or y1 > frame.shape[0]:
+        return cv2.putText(frame, text, org, FONT, scale, color, thickness)
     
+    np.copyto(frame[y0:y1, x0:x1], np.array(color, dtype=frame.dtype), where=mask[..., None])
     return frame
 
 def draw_safety_score(frame, score):
     """Draw safety score on frame"""
     score_text = f"Safety Score: {score}/10"
-    cv2.putText(frame, score_text, (20, 40), 
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-    return frame
\ No newline at end of file
+    return draw_text(frame, score_text, (20, 40), 1, SCORE_COLOR, 2)